@@ -2,8 +2,11 @@
 """vLLM Workload Load Test - based on vllm bench"""
 
 import argparse
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 from src.config_loader import load_config
@@ -21,16 +24,24 @@ def setup_logging(log_file: str = None, verbose: bool = False):
     console.setLevel(level)
     console.setFormatter(formatter)
 
-    root = logging.getLogger()
-    root.setLevel(level)
-    root.addHandler(console)
+    handlers = [console]
 
     if log_file:
         Path(log_file).parent.mkdir(parents=True, exist_ok=True)
         file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    # Log calls only enqueue records; a background listener thread does the I/O
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
 
 
 def main():
@@ -65,6 +76,8 @@ def main():
             print("\n✅ Completed!\n")
             print("📊 Results:")
             print(f"   - CSV: {config.output.aggregated_csv}")
+            if config.output.aggregated_parquet:
+                print(f"   - Parquet: {config.output.aggregated_parquet}")
             print(f"   - Summary: {config.output.summary_json}")
             print(f"   - Plots: {config.output.plots_dir}")
 
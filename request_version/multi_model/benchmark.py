@@ -1,5 +1,10 @@
 import asyncio
 import aiohttp
+import bisect
+import csv
+import math
+import os
+import socket
 import time
 import random
 import numpy as np
@@ -8,6 +13,25 @@ import argparse
 from datetime import datetime
 from tqdm import tqdm
 
+try:
+    import orjson
+    dumps = orjson.dumps
+except ImportError:
+    import json
+    def dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 API_ENDPOINT = "http://localhost:8001/v1/completions" 
 MODELS = ['Chatbot-A-large', 'Chatbot-B', 'Chatbot-C']
 
@@ -17,51 +41,171 @@ TEST_DURATION = 60
 # Base concurrency (Requests Per Second)
 TARGET_RPS = 1
 
+# Maximum number of in-flight requests (size of the worker pool)
+MAX_CONCURRENCY = 64
+
 # Input Prompt (length should be fixed to exclude input length interference, focusing on switching)
 PROMPT_TEXT = "Define the Service Level Objective in one sentence."
 MAX_TOKENS = 50
 
-async def send_request(session, request_id, model_name, scenario_name):
-    """
-    Send a single request, using Streaming mode to measure TTFT and ITL
-    """
-    url = API_ENDPOINT
-    payload = {
-        "model": model_name,
+# Request bodies are identical apart from the model, so encode them once up front
+PAYLOADS = {
+    m: dumps({
+        "model": m,
         "prompt": PROMPT_TEXT,
         "max_tokens": MAX_TOKENS,
         "temperature": 0.7,
         "stream": True
-    }
+    })
+    for m in MODELS
+}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+SSE_DONE = b"data: [DONE]"
+
+# Columns of a result row, in the order returned by send_request
+RESULT_FIELDS = [
+    "request_id", "scenario", "model", "start_time", "ttft_ms",
+    "total_latency_ms", "avg_itl_ms", "token_count", "status"
+]
+
+SCENARIO_NAMES = {1: "round_robin", 2: "zipfian", 3: "bursty"}
+
+# Connection pool settings
+CONNECTION_LIMIT = 512
+DNS_CACHE_TTL = 300 # seconds
+SOCK_READ_TIMEOUT = 30 # seconds
+
+def nodelay_socket_factory(addr_info):
+    """Create the connection socket with Nagle's algorithm disabled so small streamed chunks are not delayed"""
+    family, type_, proto, _, _ = addr_info
+    sock = socket.socket(family=family, type=type_, proto=proto)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+if njit is not None:
+    @njit(cache=True)
+    def _next_uniform(s):
+        """Advance the xoshiro256** state in place and return a float in [0, 1)"""
+        result = s[1] * np.uint64(5)
+        result = ((result << np.uint64(7)) | (result >> np.uint64(57))) * np.uint64(9)
+        t = s[1] << np.uint64(17)
+        s[2] ^= s[0]
+        s[3] ^= s[1]
+        s[1] ^= s[2]
+        s[0] ^= s[3]
+        s[2] ^= t
+        s[3] = (s[3] << np.uint64(45)) | (s[3] >> np.uint64(19))
+        return (result >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+    @njit(cache=True)
+    def gen_schedule(n, rps, weights_cdf, seed):
+        """Generate n Poisson inter-arrival times and weighted model indices in one compiled loop"""
+        # Seed the 256-bit state with splitmix64
+        s = np.empty(4, dtype=np.uint64)
+        x = np.uint64(seed)
+        for j in range(4):
+            x += np.uint64(0x9E3779B97F4A7C15)
+            z = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            s[j] = z ^ (z >> np.uint64(31))
+        
+        out_times = np.empty(n)
+        out_model = np.empty(n, dtype=np.int64)
+        last = len(weights_cdf) - 1
+        for i in range(n):
+            out_times[i] = -np.log(1.0 - _next_uniform(s)) / rps
+            out_model[i] = min(np.searchsorted(weights_cdf, _next_uniform(s), side="right"), last)
+        return out_times, out_model
+else:
+    def gen_schedule(n, rps, weights_cdf, seed):
+        """Pure-Python gen_schedule: the same splitmix64-seeded xoshiro256** stream, so a seed gives the same schedule with or without numba"""
+        s = []
+        x = int(seed) & _MASK64
+        for _ in range(4):
+            x = (x + 0x9E3779B97F4A7C15) & _MASK64
+            z = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+            z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+            s.append(z ^ (z >> 31))
+        s0, s1, s2, s3 = s
+        
+        def next_uniform():
+            nonlocal s0, s1, s2, s3
+            result = (s1 * 5) & _MASK64
+            result = ((((result << 7) | (result >> 57)) & _MASK64) * 9) & _MASK64
+            t = (s1 << 17) & _MASK64
+            s2 ^= s0
+            s3 ^= s1
+            s1 ^= s2
+            s0 ^= s3
+            s2 ^= t
+            s3 = ((s3 << 45) | (s3 >> 19)) & _MASK64
+            return (result >> 11) * (1.0 / 9007199254740992.0)
+        
+        cdf = weights_cdf.tolist()
+        last = len(cdf) - 1
+        out_times = np.empty(n)
+        out_model = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            out_times[i] = -math.log(1.0 - next_uniform()) / rps
+            out_model[i] = min(bisect.bisect_right(cdf, next_uniform()), last)
+        return out_times, out_model
+
+def count_sse_events(buf, end):
+    """Count `data:` events in buf[:end] (complete SSE lines), excluding the [DONE] marker, without copying"""
+    events = buf.startswith(b"data:", 0, end) + buf.count(b"\ndata:", 0, end)
+    return events - buf.count(SSE_DONE, 0, end)
+
+async def send_request(session, request_id, model_name, scenario_name, buf=None):
+    """
+    Send a single request, using Streaming mode to measure TTFT and ITL
     
-    start_time = time.time()
-    ttft = 0
-    total_latency = 0
+    `buf` is a scratch bytearray for the stream, reused across requests by the caller
+    """
+    url = API_ENDPOINT
+    if buf is None:
+        buf = bytearray()
+    
+    start_time = time.time() # wall clock, only used to place the request on the plot timeline
+    start_ns = time.monotonic_ns()
+    first_token_ns = None
+    last_token_ns = None
     token_count = 0
     status = "FAIL"
     
     try:
-        async with session.post(url, json=payload) as response:
+        async with session.post(url, data=PAYLOADS[model_name], headers=JSON_HEADERS) as response:
             if response.status == 200:
-                first_token_time = None
-                last_token_time = None
+                buf.clear()
+                done = False
                 
-                async for line in response.content:
-                    if line:
-                        current_time = time.time()
-                        
+                async for chunk in response.content.iter_any():
+                    # After [DONE], keep reading to EOF so the connection is returned to the pool
+                    if done:
+                        continue
+                    now_ns = time.monotonic_ns()
+                    buf += chunk
+                    
+                    # Only scan complete lines, keep a partial trailing line for the next chunk
+                    end = buf.rfind(b"\n")
+                    if end < 0:
+                        continue
+                    tokens_in_chunk = count_sse_events(buf, end)
+                    done = buf.find(SSE_DONE, 0, end) != -1
+                    del buf[:end + 1]
+                    
+                    # One token per SSE data event
+                    if tokens_in_chunk:
                         # Capture TTFT (Time of first data received)
-                        if first_token_time is None:
-                            first_token_time = current_time
-                            ttft = (first_token_time - start_time) * 1000 # ms
+                        if first_token_ns is None:
+                            first_token_ns = now_ns
                         
-                        last_token_time = current_time
-                        token_count += 1
+                        last_token_ns = now_ns
+                        token_count += tokens_in_chunk
                 
-                # Calculate total latency
-                if last_token_time:
-                    end_time = last_token_time
-                    total_latency = (end_time - start_time) * 1000 # ms
+                if last_token_ns is not None:
                     status = "SUCCESS"
                 else:
                     # 200 OK but no content
@@ -75,9 +219,15 @@ async def send_request(session, request_id, model_name, scenario_name):
         tqdm.write(f"Request failed: {e}")
         pass
     
+    # Timestamps stay in integer nanoseconds, converted to ms only here
+    ttft = 0
+    total_latency = 0
     avg_itl = 0
-    if token_count > 1 and status == "SUCCESS":
-        avg_itl = (total_latency - ttft) / (token_count - 1)
+    if status == "SUCCESS":
+        ttft = (first_token_ns - start_ns) / 1e6 # ms
+        total_latency = (last_token_ns - start_ns) / 1e6 # ms
+        if token_count > 1:
+            avg_itl = (last_token_ns - first_token_ns) / (token_count - 1) / 1e6 # ms
 
     return {
         "request_id": request_id,
@@ -91,125 +241,202 @@ async def send_request(session, request_id, model_name, scenario_name):
         "status": status
     }
 
-async def run_scenario_round_robin(session, results):
+async def worker(session, queue, writer):
+    """Consume (request_id, model, scenario) items from the queue until a None sentinel, writing each result row"""
+    buf = bytearray()
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                return
+            request_id, model_name, scenario_name = item
+            writer.writerow(await send_request(session, request_id, model_name, scenario_name, buf))
+        finally:
+            queue.task_done()
+
+async def progress_ticker(pbar, start, duration):
+    """Advance the progress bar once per second, off the scheduling loop"""
+    while pbar.n < duration:
+        await asyncio.sleep(1.0)
+        pbar.update(min(int(time.monotonic() - start), duration) - pbar.n)
+
+async def run_scenario_round_robin(queue):
     """Scenario 1: Extreme Switching (Round Robin)"""
     print(f"--- Starting Scenario: Round Robin (Worst Case) ---")
-    start_test = time.time()
+    # Hoist globals/attributes used in the dispatch loop into locals
+    _now = time.monotonic
+    _sleep = asyncio.sleep
+    _put = queue.put
+    _models = MODELS
+    _nmod = len(MODELS)
+    
+    start_test = _now()
     req_id = 0
     
     # Use tqdm to create a progress bar, total amount is test seconds
     with tqdm(total=TEST_DURATION, desc="Round Robin Progress", unit="s") as pbar:
-        last_update_time = start_test
+        ticker = asyncio.create_task(progress_ticker(pbar, start_test, TEST_DURATION))
         
-        while time.time() - start_test < TEST_DURATION:
-            model = MODELS[req_id % len(MODELS)]
-            task = asyncio.create_task(send_request(session, f"RR-{req_id}", model, "round_robin"))
-            results.append(task)
+        # Sleep until the next deadline rather than a fixed interval, so dispatch time does not accumulate as drift
+        interval = 1.0 / TARGET_RPS
+        deadline = start_test
+        
+        while _now() - start_test < TEST_DURATION:
+            model = _models[req_id % _nmod]
+            await _put((f"RR-{req_id}", model, "round_robin"))
             req_id += 1
             
-            await asyncio.sleep(1.0 / TARGET_RPS)
-            
-            now = time.time()
-            pbar.update(now - last_update_time)
-            last_update_time = now
+            deadline += interval
+            sleep_for = deadline - _now()
+            if sleep_for > 0:
+                await _sleep(sleep_for)
+        
+        await ticker
 
-async def run_scenario_zipfian(session, results, seed):
+async def run_scenario_zipfian(queue, seed):
     """Scenario 2: Real Distribution (Zipfian / Weighted)"""
     print(f"--- Starting Scenario: Zipfian (Real World) with seed {seed} ---")
     # Set weights: First model 80%, the rest share the remaining 20%
     weights = [0.8] + [(0.2 / (len(MODELS)-1))] * (len(MODELS)-1)
     
-    # Initialize random generators
-    random_gen = random.Random(seed)
-    np_gen = np.random.default_rng(seed)
+    # Pre-sample the whole schedule (2x the expected request count) in one call:
+    # Poisson process interval times (closer to real traffic) and weighted model choices
+    n_est = int(TEST_DURATION * TARGET_RPS * 2)
+    # Any --seed is reduced to 64 bits, the generator's seed width, so both implementations accept it
+    intervals, model_idx = gen_schedule(n_est, float(TARGET_RPS), np.cumsum(weights), np.uint64(seed & _MASK64))
+    intervals = intervals.tolist()
+    models_seq = [MODELS[i] for i in model_idx]
+    
+    # Hoist globals/attributes used in the dispatch loop into locals
+    _now = time.monotonic
+    _sleep = asyncio.sleep
+    _put = queue.put
 
-    start_test = time.time()
-    req_id = 0
+    start_test = _now()
     
     with tqdm(total=TEST_DURATION, desc="Zipfian Progress", unit="s") as pbar:
-        last_update_time = start_test
+        ticker = asyncio.create_task(progress_ticker(pbar, start_test, TEST_DURATION))
         
-        while time.time() - start_test < TEST_DURATION:
-            # Randomly select based on weights
-            model = random_gen.choices(MODELS, weights=weights, k=1)[0]
-            task = asyncio.create_task(send_request(session, f"ZIPF-{req_id}", model, "zipfian"))
-            results.append(task)
-            req_id += 1
-            # Use Poisson process interval time (closer to real traffic)
-            sleep_time = np_gen.exponential(1.0 / TARGET_RPS)
-            await asyncio.sleep(sleep_time)
-            
-            now = time.time()
-            pbar.update(now - last_update_time)
-            last_update_time = now
+        for req_id in range(n_est):
+            if _now() - start_test >= TEST_DURATION:
+                break
+            await _put((f"ZIPF-{req_id}", models_seq[req_id], "zipfian"))
+            await _sleep(intervals[req_id])
+        
+        await ticker
 
-async def run_scenario_bursty(session, results, seed):
+async def run_scenario_bursty(queue, seed):
     """Scenario 3: Bursty Traffic (Bursty)"""
     print(f"--- Starting Scenario: Bursty (Stress Test) with seed {seed} ---")
     
-    # Initialize random generator
+    # Initialize random generators
     random_gen = random.Random(seed)
+    np_gen = np.random.default_rng(seed)
+    
+    # Pre-sample background traffic models (2x the expected background request count)
+    n_bg = int(TEST_DURATION * TARGET_RPS) + 1
+    bg_models = [MODELS[i] for i in np_gen.choice(len(MODELS), size=n_bg)]
+    bg_idx = 0
+    
+    # Hoist globals/attributes used in the dispatch loop into locals
+    _now = time.monotonic
+    _sleep = asyncio.sleep
+    _put = queue.put
+    _write = tqdm.write
+    _models = MODELS
 
-    start_test = time.time()
+    start_test = _now()
     req_id = 0
     
     with tqdm(total=TEST_DURATION, desc="Bursty Progress", unit="s") as pbar:
-        last_update_time = start_test
+        ticker = asyncio.create_task(progress_ticker(pbar, start_test, TEST_DURATION))
+        
+        bg_interval = 1.0 / (TARGET_RPS / 2) # Background traffic set to half of the target
+        deadline = start_test
         
-        while time.time() - start_test < TEST_DURATION:
-            current_elapsed = time.time() - start_test
+        while (current_elapsed := _now() - start_test) < TEST_DURATION:
             
             # Generate burst traffic every 10 seconds
             if int(current_elapsed) % 10 == 0 and int(current_elapsed) > 0:
                 # Use tqdm.write to print logs to avoid progress bar confusion
-                tqdm.write(f"!!! BURST INCOMING at {int(current_elapsed)}s !!!")
+                _write(f"!!! BURST INCOMING at {int(current_elapsed)}s !!!")
                 
                 burst_size = 10  # Inject 10 requests at once
                 # Bursty traffic is usually mixed, here randomly mixed
-                burst_models = random_gen.choices(MODELS, k=burst_size)
+                burst_models = random_gen.choices(_models, k=burst_size)
                 
                 for model in burst_models:
-                    task = asyncio.create_task(send_request(session, f"BURST-{req_id}", model, "bursty"))
-                    results.append(task)
+                    await _put((f"BURST-{req_id}", model, "bursty"))
                     req_id += 1
                 
                 # Rest a bit after burst to avoid instant overload causing Client crash
-                await asyncio.sleep(1) 
+                # (measured from now, so a late deadline cannot trigger a second burst in the same second)
+                deadline = max(deadline, _now()) + 1
             else:
                 # Background traffic (low load)
-                model = random_gen.choice(MODELS)
-                task = asyncio.create_task(send_request(session, f"BG-{req_id}", model, "bursty"))
-                results.append(task)
+                model = bg_models[bg_idx % n_bg]
+                bg_idx += 1
+                await _put((f"BG-{req_id}", model, "bursty"))
                 req_id += 1
-                await asyncio.sleep(1.0 / (TARGET_RPS / 2)) # Background traffic set to half of the target
+                deadline += bg_interval
             
-            now = time.time()
-            pbar.update(now - last_update_time)
-            last_update_time = now
+            sleep_for = deadline - _now()
+            if sleep_for > 0:
+                await _sleep(sleep_for)
+        
+        await ticker
 
-async def run_single_test(session, test_case, seed):
-    all_tasks = []
-    case_name = ""
+def save_results(df, file_name):
+    """Convert the streamed CSV results to zstd-compressed Parquet, keeping the CSV when pyarrow is not installed"""
+    try:
+        filename = f"{file_name}.parquet"
+        df.to_parquet(filename, engine="pyarrow", compression="zstd", index=False)
+    except ImportError:
+        return f"{file_name}.csv"
+    os.remove(f"{file_name}.csv")
+    return filename
+
+def open_results_csv(file_name):
+    """Start a fresh results CSV for a case and return the open file"""
+    # Parquet left by an earlier run would shadow this run's CSV in draw.py if this run is interrupted
+    if os.path.exists(f"{file_name}.parquet"):
+        os.remove(f"{file_name}.parquet")
     
-    if test_case == 1:
-        case_name = "round_robin"
-        await run_scenario_round_robin(session, all_tasks)
-    elif test_case == 2:
-        case_name = "zipfian"
-        await run_scenario_zipfian(session, all_tasks, seed)
-    elif test_case == 3:
-        case_name = "bursty"
-        await run_scenario_bursty(session, all_tasks, seed)
+    return open(f"{file_name}.csv", "w", newline="")
+
+async def run_single_test(session, test_case, seed):
+    case_name = SCENARIO_NAMES[test_case]
+    file_name = f"benchmark_results_{case_name}"
     
-    print(f"\nAll requests dispatched for {case_name}. Waiting for pending responses...")
+    # A fixed pool of workers sends the requests scheduled by the scenario,
+    # capping in-flight requests instead of spawning one task per request.
+    # The TaskGroup waits for the workers and cancels everything if one of them fails
+    queue = asyncio.Queue(maxsize=2 * TARGET_RPS)
     
-    responses = []
-    for f in tqdm(asyncio.as_completed(all_tasks), total=len(all_tasks), desc="Collecting Responses", unit="req"):
-        responses.append(await f)
+    # Rows are written as requests complete, so memory stays flat and an interrupted run keeps its partial results.
+    # The file is opened off the event loop; each writerow only fills the file buffer
+    with await asyncio.to_thread(open_results_csv, file_name) as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        
+        async with asyncio.TaskGroup() as tg:
+            workers = [tg.create_task(worker(session, queue, writer)) for _ in range(MAX_CONCURRENCY)]
+            
+            if test_case == 1:
+                await run_scenario_round_robin(queue)
+            elif test_case == 2:
+                await run_scenario_zipfian(queue, seed)
+            elif test_case == 3:
+                await run_scenario_bursty(queue, seed)
+            
+            print(f"\nAll requests dispatched for {case_name}. Waiting for pending responses...")
+            
+            # One sentinel per worker: each drains the remaining items, then exits
+            for _ in workers:
+                await queue.put(None)
     
-    df = pd.DataFrame(responses)
-    filename = f"benchmark_results_{case_name}.csv"
-    df.to_csv(filename, index=False)
+    df = pd.read_csv(f"{file_name}.csv")
+    filename = save_results(df, file_name)
     print(f"Done! Results saved to {filename}")
     
     print(f"\n=== Quick Summary ({case_name}) ===")
@@ -220,7 +447,7 @@ async def run_single_test(session, test_case, seed):
 
 async def main(seed):
     print(f"Running in RPS{TARGET_RPS}")
-    print(f"Running in Random Seed: {seed}")
+    print(f"Running in Random Seed: {seed} (zipfian schedule: xoshiro256**, {'numba' if njit is not None else 'pure Python'})")
     print("input test_case number:")
     print("1. Round Robin")
     print("2. Zipfian (Real Distribution)")
@@ -237,7 +464,18 @@ async def main(seed):
         print(f"Please enter option 1, 2, 3, or 4")
         return
 
-    async with aiohttp.ClientSession() as session:
+    # One keep-alive connection pool shared by all scenarios
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        enable_cleanup_closed=True,
+        force_close=False,
+        socket_factory=nodelay_socket_factory,
+    )
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=SOCK_READ_TIMEOUT)
+    
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
         if test_case == 4:
             scenarios = [1, 2, 3]
             for i, scenario in enumerate(scenarios):
@@ -1,43 +1,75 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg") # Non-GUI backend, safe to use from worker processes
 import matplotlib.pyplot as plt
 import seaborn as sns
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.patches import Patch
 from matplotlib.ticker import MultipleLocator
 
+try:
+    from scipy.stats import gaussian_kde
+except ImportError:
+    gaussian_kde = None # The Total KDE line is skipped without scipy
+
 TARGET_TTFT=5000 # ms
+KDE_MAX_SAMPLES = 5000 # Subsample size used to fit the KDE
+KDE_GRID_POINTS = 512
+HEXBIN_GRIDSIZE = 40
 
-# Read data
-cases = ["round_robin", "zipfian", "bursty"]
-dfs = {}
-all_models = set()
+def padded_range(values):
+    """(min, max) of values, widened around the value when the range has zero width (hexbin divides by it)"""
+    lo, hi = float(values.min()), float(values.max())
+    if hi > lo:
+        return lo, hi
+    pad = abs(lo) * 0.05 or 1.0
+    return lo - pad, hi + pad
 
-# Step 1: Read all data to determine all appearing models
-for case in cases:
-    file_name = f"benchmark_results_{case}"
+def density_plot(ax, x, y, masks, palette):
+    """Per-model hexbin density (O(bins) artists instead of O(N) points), with P99 outliers drawn as markers"""
+    if len(x) == 0:
+        return
+    # Shared grid so the models' hexagons line up; zero-width ranges (e.g. all-zero TTFT of failed runs) are padded
+    extent = (*padded_range(x), *padded_range(y))
+    outliers = y > np.percentile(y, 99)
+    for model, mask in masks.items():
+        if not mask.any():
+            continue
+        cmap = LinearSegmentedColormap.from_list(model, ['white', palette[model]])
+        # vmin=0 so single-point cells get a visible tint instead of the white end of the colormap
+        ax.hexbin(x[mask], y[mask], gridsize=HEXBIN_GRIDSIZE, extent=extent, cmap=cmap, mincnt=1, vmin=0, alpha=0.6)
+        out = mask & outliers
+        ax.scatter(x[out], y[out], color=palette[model], s=8)
+    ax.legend(handles=[Patch(color=palette[model], label=model) for model in masks], title='model')
+
+def load_results(file_name):
+    """Load benchmark results, preferring Parquet and falling back to legacy CSV files"""
+    if os.path.exists(f'{file_name}.parquet'):
+        return pd.read_parquet(f'{file_name}.parquet')
     try:
-        df = pd.read_csv(f'{file_name}.csv')
-        # Preprocessing: Normalize start time to start from 0
-        df['relative_start_time'] = df['start_time'] - df['start_time'].min()
-        dfs[case] = df
-        all_models.update(df['model'].unique())
-    except FileNotFoundError:
-        print(f"Warning: {file_name}.csv not found")
-
-# Set unified colors and order
-unique_models = sorted(list(all_models))
-palette = dict(zip(unique_models, sns.color_palette("tab10", len(unique_models))))
-
-for case in cases:
-    if case not in dfs:
-        continue
-        
-    df = dfs[case]
+        return pd.read_csv(f'{file_name}.csv', engine='pyarrow')
+    except ImportError:
+        return pd.read_csv(f'{file_name}.csv')
+
+def render_case(case, df, palette, unique_models, bins):
+    """Render the 2x2 analysis figure of one test case into its own PNG"""
     file_name = f"benchmark_results_{case}"
 
+    # Column arrays shared by the subplots below
+    rel = df['relative_start_time'].to_numpy()
+    ttft = df['ttft_ms'].to_numpy()
+    itl = df['avg_itl_ms'].to_numpy()
+    codes = pd.Categorical(df['model'], categories=unique_models).codes
+    masks = {model: codes == k for k, model in enumerate(unique_models)}
+
     # Set up canvas
-    fig, axes = plt.subplots(2, 2, figsize=(18, 12))
+    _, axes = plt.subplots(2, 2, figsize=(18, 12))
 
     # 1. System Stability (Time vs TTFT)
-    sns.scatterplot(data=df, x='relative_start_time', y='ttft_ms', hue='model', palette=palette, hue_order=unique_models, ax=axes[0, 0])
+    density_plot(axes[0, 0], rel, ttft, masks, palette)
     axes[0, 0].set_title('1. System Stability: TTFT over Time')
     axes[0, 0].set_xlabel('Time Elapsed (s)')
     axes[0, 0].xaxis.set_major_locator(MultipleLocator(10))  # Time 10s per unit
@@ -45,25 +77,27 @@ for case in cases:
     axes[0, 0].grid(True)
 
     # 2. Distribution Detection (TTFT Distribution)
-    sns.histplot(data=df, x='ttft_ms', kde=True, hue='model', palette=palette, hue_order=unique_models, element="step", ax=axes[0, 1])
+    sns.histplot(data=df, x='ttft_ms', bins=bins, hue='model', palette=palette, hue_order=unique_models, element="step", ax=axes[0, 1])
+    
+    # Draw an unfilled histplot to represent Total
+    sns.histplot(x=ttft, bins=bins, color='red', element="step", fill=False, ax=axes[0, 1], label='Total')
     
-    # Add Total line (Black)
-    sns.kdeplot(data=df, x='ttft_ms', color='black', linewidth=2, ax=axes[0, 1], label='Total KDE')
-    # Note: kdeplot is a density plot, histplot defaults to count. If displayed on the same axis, there may be scaling issues.
-    # But the user requested a "total line", usually referring to the overall trend.
-    # To make the Total line easier to compare with the Histogram, we can use histplot(element="poly", fill=False) to draw the Total outline
-    # Or we can use dual axes, but that would make the chart complicated.
-    # For simplicity, we draw an unfilled histplot to represent Total
-    sns.histplot(data=df, x='ttft_ms', kde=True, color='red', element="step", fill=False, ax=axes[0, 1], label='Total')
+    # Add Total KDE line (Black), fitted once on a subsample and scaled from density to counts
+    if gaussian_kde is not None and len(ttft) > 1 and np.ptp(ttft) > 0:
+        rng = np.random.default_rng(0)
+        sample = ttft if len(ttft) <= KDE_MAX_SAMPLES else rng.choice(ttft, KDE_MAX_SAMPLES, replace=False)
+        grid = np.linspace(bins[0], bins[-1], KDE_GRID_POINTS)
+        pdf = gaussian_kde(sample)(grid) * len(ttft) * (bins[1] - bins[0])
+        axes[0, 1].plot(grid, pdf, color='black', linewidth=2, label='Total KDE')
 
     # Add TTFT 5000ms line
     TARGET_TTFT = 5000
     axes[0, 1].axvline(TARGET_TTFT, color='red', linestyle='--', linewidth=2, label=f'Target {TARGET_TTFT}ms')
     
     # Calculate and display percentage
-    pct_within = (df['ttft_ms'] <= TARGET_TTFT).mean() * 100
+    pct_within = (ttft <= TARGET_TTFT).mean() * 100
     # Get Y-axis range to determine text position
-    y_min, y_max = axes[0, 1].get_ylim()
+    _, y_max = axes[0, 1].get_ylim()
     axes[0, 1].text(TARGET_TTFT + 100, y_max * 0.9, f'{pct_within:.1f}% <= {TARGET_TTFT}ms', color='red', fontweight='bold')
 
     axes[0, 1].set_title('2. Latency Distribution (Check for Bimodal)')
@@ -72,7 +106,7 @@ for case in cases:
     axes[0, 1].grid(True)
 
     # 3. Bottleneck Analysis (TTFT vs ITL)
-    sns.scatterplot(data=df, x='ttft_ms', y='avg_itl_ms', hue='model', palette=palette, hue_order=unique_models, ax=axes[1, 0])
+    density_plot(axes[1, 0], ttft, itl, masks, palette)
     axes[1, 0].set_title('3. Bottleneck Analysis: Scheduling(TTFT) vs Compute(ITL)')
     axes[1, 0].set_ylim(bottom=0) # Ensure 0 is visible
     axes[1, 0].xaxis.set_major_locator(MultipleLocator(1000)) # TTFT 1000ms per unit
@@ -83,8 +117,58 @@ for case in cases:
     axes[1, 1].set_title('4. Total Latency Overview per Model')
     axes[1, 1].grid(True)
 
+    # Per-model total latency percentiles
+    lat = df['total_latency_ms'].to_numpy()
+    for model, mask in masks.items():
+        model_lat = lat[mask]
+        if len(model_lat):
+            p50, p90, p99 = np.percentile(model_lat, (50, 90, 99))
+            print(f"[{case}] {model}: P50={p50:.1f}ms P90={p90:.1f}ms P99={p99:.1f}ms")
+
     plt.tight_layout()
     # plt.show()
     print(f"save figure {file_name}.png")
     plt.savefig(f'{file_name}.png')
-    plt.close()
\ No newline at end of file
+    plt.close()
+
+
+if __name__ == "__main__":
+    # Read data
+    cases = ["round_robin", "zipfian", "bursty"]
+    frames = []
+
+    # Step 1: Read all cases into one frame tagged with its scenario
+    for case in cases:
+        file_name = f"benchmark_results_{case}"
+        try:
+            d = load_results(file_name)
+            d['scenario'] = case
+            frames.append(d)
+        except FileNotFoundError:
+            print(f"Warning: {file_name}.parquet / {file_name}.csv not found")
+
+    if not frames:
+        raise SystemExit("No benchmark results found")
+
+    big = pd.concat(frames, ignore_index=True)
+    big['scenario'] = pd.Categorical(big['scenario'], categories=cases)
+    # Preprocessing: Normalize start time to start from 0 within each scenario
+    big['relative_start_time'] = big['start_time'] - big.groupby('scenario', observed=True)['start_time'].transform('min')
+
+    # Set unified colors, order and TTFT bins so figures are comparable across scenarios
+    unique_models = sorted(big['model'].unique())
+    palette = dict(zip(unique_models, sns.color_palette("tab10", len(unique_models))))
+    ttft_bins = np.histogram_bin_edges(big['ttft_ms'].to_numpy(), bins="auto")
+
+    # Each case is rendered in its own process; palette is computed here so colors stay consistent
+    views = {case: df for case, df in big.groupby('scenario', observed=True)}
+    rendered = [case for case in cases if case in views]
+    with ProcessPoolExecutor(max_workers=len(rendered)) as ex:
+        list(ex.map(
+            render_case,
+            rendered,
+            [views[case] for case in rendered],
+            [palette] * len(rendered),
+            [unique_models] * len(rendered),
+            [ttft_bins] * len(rendered),
+        ))
@@ -1,12 +1,22 @@
+import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+
 try:
-    df = pd.read_csv("vllm_full_benchmark.csv")
+    # Prefer Parquet output, fall back to legacy CSV files
+    if os.path.exists("vllm_full_benchmark.parquet"):
+        df = pd.read_parquet("vllm_full_benchmark.parquet")
+    else:
+        try:
+            df = pd.read_csv("vllm_full_benchmark.csv", engine="pyarrow")
+        except ImportError:
+            df = pd.read_csv("vllm_full_benchmark.csv")
 except FileNotFoundError:
     print(
-        "Error: 'vllm_full_benchmark.csv' not found. Please run the benchmark script first."
+        "Error: 'vllm_full_benchmark.parquet' / 'vllm_full_benchmark.csv' not found. Please run the benchmark script first."
     )
     exit()
 
@@ -21,12 +31,14 @@ plt.subplot(1, 2, 1)
 ttft_data = df[df["phase"] == "TTFT"]
 
 if not ttft_data.empty:
-    # Calculate percentiles
-    stats = (
-        ttft_data.groupby("input_len")["ttft_ms"].quantile([0.5, 0.9, 0.99]).unstack()
+    # Calculate percentiles (linear interpolation, same estimator as the benchmark's ITL percentiles)
+    stats = pd.DataFrame(
+        [
+            [input_len, *np.percentile(g.to_numpy(), (50, 90, 99))]
+            for input_len, g in ttft_data.groupby("input_len")["ttft_ms"]
+        ],
+        columns=["input_len", "P50", "P90", "P99"],
     )
-    stats.columns = ["P50", "P90", "P99"]
-    stats = stats.reset_index()
 
     # Draw SLO reference line (5s)
     # SLO_TARGET = 5000
@@ -103,12 +115,26 @@ itl_data = df[df["phase"] == "ITL"]
 
 if not itl_data.empty:
     # Focus on average ITL and P99 ITL for each batch size
-    itl_stats = (
-        itl_data.groupby("concurrency")["itl_ms"]
-        .agg(["mean", lambda x: x.quantile(0.99)])
-        .reset_index()
-    )
-    itl_stats.columns = ["concurrency", "Mean_ITL", "P99_ITL"]
+    if "itl_p99_ms" in itl_data.columns:
+        # One summary row per batch size, percentiles computed by the benchmark
+        itl_stats = pd.DataFrame(
+            {
+                "concurrency": itl_data["concurrency"].to_numpy(),
+                "Mean_ITL": itl_data["itl_ms"].to_numpy(),
+                "P99_ITL": itl_data["itl_p99_ms"].to_numpy(),
+            }
+        ).sort_values("concurrency")
+    else:
+        # Legacy files with one row per request
+        gb = itl_data.groupby("concurrency")["itl_ms"]
+        mean_itl = gb.mean()
+        itl_stats = pd.DataFrame(
+            {
+                "concurrency": mean_itl.index.to_numpy(),
+                "Mean_ITL": mean_itl.to_numpy(),
+                "P99_ITL": [np.percentile(g.to_numpy(), 99) for _, g in gb],
+            }
+        )
 
     # Draw P99 ITL
     sns.lineplot(
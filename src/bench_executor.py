@@ -3,12 +3,25 @@
 import subprocess
 import json
 import logging
+import os
+import signal
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Iterable, Optional, List
 from dataclasses import dataclass
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+BENCH_TIMEOUT = 3600  # seconds
+OUTPUT_TAIL_LINES = 50  # Output lines kept for error reporting
+
 
 @dataclass
 class BenchCommand:
@@ -33,8 +46,9 @@ class BenchCommand:
 class BenchExecutor:
     """Execute vllm bench"""
 
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", max_parallel: int = 1):
         self.base_url = base_url
+        self.max_parallel = max_parallel
 
     def build_command(self, config: BenchCommand) -> List[str]:
         """Build vllm bench command"""
@@ -88,6 +102,57 @@ class BenchExecutor:
 
         return cmd
 
+    def _stream_command(self, cmd: List[str]):
+        """Run command, streaming its output to the logger instead of buffering it"""
+        tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        timed_out = threading.Event()
+
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            start_new_session=True,
+        ) as proc:
+
+            def kill_tree():
+                # Kill the whole process group: grandchildren holding the pipe open
+                # would otherwise keep the read loop below blocked
+                if hasattr(os, "killpg"):
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                else:
+                    proc.kill()
+
+            def on_timeout():
+                timed_out.set()
+                kill_tree()
+
+            # Enforce the timeout while output is being consumed
+            timer = threading.Timer(BENCH_TIMEOUT, on_timeout)
+            timer.start()
+            try:
+                for line in proc.stdout:
+                    line = line.rstrip()
+                    logger.debug(line)
+                    tail.append(line)
+                returncode = proc.wait()
+            except BaseException:
+                # The child runs in its own session, so Ctrl-C does not reach it
+                kill_tree()
+                raise
+            finally:
+                timer.cancel()
+
+        output = "\n".join(tail)
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(cmd, BENCH_TIMEOUT, output=output)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, output=output)
+
     def execute(self, config: BenchCommand) -> Dict:
         """Execute command"""
         cmd = self.build_command(config)
@@ -100,24 +165,27 @@ class BenchExecutor:
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
         try:
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, check=True, timeout=3600
-            )
+            self._stream_command(cmd)
 
             logger.info("Command completed")
-            logger.debug(f"STDOUT: {result.stdout}")
 
             # Read results
             if output_path.exists():
-                with open(output_path, "r") as f:
-                    return json.load(f)
+                data = output_path.read_bytes()
+                if orjson is not None:
+                    try:
+                        return orjson.loads(data)
+                    except orjson.JSONDecodeError:
+                        # json.dump may emit NaN/Infinity, which orjson rejects
+                        pass
+                return json.loads(data)
             else:
                 logger.warning(f"Output not found: {output_path}")
                 return {}
 
         except subprocess.CalledProcessError as e:
             logger.error(f"Command failed: {e.returncode}")
-            logger.error(f"STDERR: {e.stderr}")
+            logger.error(f"OUTPUT (last {OUTPUT_TAIL_LINES} lines): {e.output}")
             raise
         except subprocess.TimeoutExpired:
             logger.error("Command timed out")
@@ -126,27 +194,57 @@ class BenchExecutor:
             logger.error(f"Error: {e}")
             raise
 
-    def execute_batch(self, configs: List[BenchCommand]) -> List[Dict]:
-        """Execute batch"""
-        results = []
+    def _execute_one(self, idx: int, total: int, config: BenchCommand) -> Dict:
+        """Execute one benchmark of a batch, capturing failures"""
+        logger.info(f"Benchmark {idx}/{total}")
 
-        for idx, config in enumerate(configs, 1):
-            logger.info(f"Benchmark {idx}/{len(configs)}")
-
-            try:
-                result = self.execute(config)
-                results.append(
-                    {"config": config, "result": result, "status": "success"}
-                )
-            except Exception as e:
-                logger.error(f"Benchmark {idx} failed: {e}")
-                results.append(
-                    {
-                        "config": config,
-                        "result": None,
-                        "status": "failed",
-                        "error": str(e),
-                    }
-                )
-
-        return results
+        try:
+            result = self.execute(config)
+            return {"config": config, "result": result, "status": "success"}
+        except Exception as e:
+            logger.error(f"Benchmark {idx} failed: {e}")
+            return {
+                "config": config,
+                "result": None,
+                "status": "failed",
+                "error": str(e),
+            }
+
+    def execute_batch(
+        self, configs: Iterable[BenchCommand], total: Optional[int] = None
+    ) -> List[Dict]:
+        """Execute batch
+
+        configs may be a lazy iterable; total is only used for progress logging
+        and defaults to len(configs).
+        """
+        if total is None:
+            total = len(configs)
+
+        if self.max_parallel <= 1:
+            return [
+                self._execute_one(idx, total, config)
+                for idx, config in enumerate(configs, 1)
+            ]
+
+        # All runs target the same base_url, so their measurements interfere
+        logger.warning(
+            f"Running up to {self.max_parallel} benchmarks in parallel against "
+            f"{self.base_url}; their results share one server's capacity"
+        )
+        # Submit at most max_parallel commands at a time so a lazy configs
+        # iterable is only consumed as slots free up (results keep input order)
+        results = {}
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            for idx, config in enumerate(configs, 1):
+                if len(pending) >= self.max_parallel:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                future = pool.submit(self._execute_one, idx, total, config)
+                pending[future] = idx
+            for future, idx in pending.items():
+                results[idx] = future.result()
+
+        return [results[idx] for idx in sorted(results)]
@@ -40,6 +40,7 @@ class BenchmarkConfig(BaseModel):
     request_rate: Optional[float] = None
     seed: int = 42
     trust_remote_code: bool = True
+    max_parallel_runs: int = Field(ge=1, default=1)
     output_format: Literal["json", "text"] = "json"
     save_results: bool = True
 
@@ -104,6 +105,7 @@ class OutputConfig(BaseModel):
     results_dir: str = "results"
     raw_results_pattern: str = "results/raw/run_{run_id}.json"
     aggregated_csv: str = "results/aggregated_results.csv"
+    aggregated_parquet: Optional[str] = None
     summary_json: str = "results/summary.json"
     plots_dir: str = "results/plots"
     log_file: str = "results/benchmark.log"
@@ -1,7 +1,7 @@
 """Experiment runner"""
 
 import logging
-from typing import List
+from typing import Iterator, List
 from itertools import product
 
 from .config_loader import Config
@@ -19,7 +19,9 @@ class ExperimentRunner:
         self.config = config
 
         base_url = f"http://{config.vllm_service.host}:{config.vllm_service.port}"
-        self.executor = BenchExecutor(base_url)
+        self.executor = BenchExecutor(
+            base_url, max_parallel=config.benchmark.max_parallel_runs
+        )
         self.aggregator = ResultAggregator(config.output.results_dir)
         self.analyzer = MetricsAnalyzer(config.output.plots_dir)
 
@@ -35,8 +37,8 @@ class ExperimentRunner:
             )
         raise ValueError(f"Unknown type: {length_config.type}")
 
-    def build_experiment_matrix(self) -> List[BenchCommand]:
-        """Build experiment matrix"""
+    def _sweep_axes(self):
+        """Expand the sweep variables into (use_concurrency, load, input, output) axes"""
         sweep = self.config.sweep_variables
 
         input_lengths = self._expand_length_config(sweep.input_lengths)
@@ -47,16 +49,24 @@ class ExperimentRunner:
             sweep.concurrency_levels if use_concurrency else sweep.request_rates
         )
 
-        commands = []
-        run_counter = 1
+        return use_concurrency, load_levels, input_lengths, output_lengths
+
+    def count_experiments(self) -> int:
+        """Number of experiments in the matrix, without building it"""
+        _, load_levels, input_lengths, output_lengths = self._sweep_axes()
+        return len(load_levels) * len(input_lengths) * len(output_lengths)
+
+    def iter_experiments(self) -> Iterator[BenchCommand]:
+        """Yield the experiment matrix one command at a time"""
+        use_concurrency, load_levels, input_lengths, output_lengths = self._sweep_axes()
 
-        for load, input_len, output_len in product(
-            load_levels, input_lengths, output_lengths
+        for run_counter, (load, input_len, output_len) in enumerate(
+            product(load_levels, input_lengths, output_lengths), 1
         ):
             run_id = f"run_{run_counter:03d}"
             output_json = self.config.output.raw_results_pattern.format(run_id=run_id)
 
-            cmd = BenchCommand(
+            yield BenchCommand(
                 model=self.config.vllm_service.model,
                 tokenizer=self.config.vllm_service.tokenizer,
                 host=self.config.vllm_service.host,
@@ -73,9 +83,9 @@ class ExperimentRunner:
                 output_json=output_json,
             )
 
-            commands.append(cmd)
-            run_counter += 1
-
+    def build_experiment_matrix(self) -> List[BenchCommand]:
+        """Build experiment matrix"""
+        commands = list(self.iter_experiments())
         logger.info(f"Built {len(commands)} experiments")
         return commands
 
@@ -101,11 +111,11 @@ class ExperimentRunner:
 
     def run_all_experiments(self):
         """Run all experiments"""
-        commands = self.build_experiment_matrix()
-        logger.info(f"Starting {len(commands)} experiments")
+        total = self.count_experiments()
+        logger.info(f"Starting {total} experiments")
 
-        # Execute in batches
-        results = self.executor.execute_batch(commands)
+        # Commands are generated lazily and executed one at a time
+        results = self.executor.execute_batch(self.iter_experiments(), total=total)
 
         # Aggregate results
         logger.info("Aggregating results...")
@@ -117,6 +127,10 @@ class ExperimentRunner:
 
         # Save
         self.aggregator.save_aggregated_results(df, self.config.output.aggregated_csv)
+        if self.config.output.aggregated_parquet:
+            self.aggregator.save_aggregated_results(
+                df, self.config.output.aggregated_parquet
+            )
 
         summary = self.aggregator.generate_summary(df)
         self.aggregator.save_summary(summary, self.config.output.summary_json)
@@ -1,16 +1,33 @@
 """Metrics analysis and visualization"""
 
+from __future__ import annotations
+
 import logging
+from functools import cache, partial
 from pathlib import Path
-from typing import List
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from pandas.core.groupby import DataFrameGroupBy
 
 logger = logging.getLogger(__name__)
 
-sns.set_theme(style="whitegrid")
-plt.rcParams["figure.figsize"] = (10, 6)
+PLOT_DPI = 200
+
+
+@cache
+def _load_pyplot():
+    """Import and configure matplotlib/seaborn on first use (slow imports)"""
+    import matplotlib
+
+    matplotlib.use("Agg")  # Non-GUI backend, plots are only saved to files
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="whitegrid")
+    plt.rcParams["figure.figsize"] = (10, 6)
+    return plt
 
 
 class MetricsAnalyzer:
@@ -20,35 +37,45 @@ class MetricsAnalyzer:
         self.plots_dir = Path(plots_dir)
         self.plots_dir.mkdir(parents=True, exist_ok=True)
 
+        # One figure reused by every plot, created on first use
+        self.fig = None
+        self.ax = None
+
+    def _clear_axes(self):
+        """Prepare the shared axes for a new plot"""
+        if self.fig is None:
+            plt = _load_pyplot()
+            self.fig, self.ax = plt.subplots(figsize=(12, 6))
+        self.ax.cla()
+
     def plot_ttft_vs_input_length(self, df: pd.DataFrame):
         """TTFT vs Input Length"""
         if "input_len" not in df.columns or "median_ttft_ms" not in df.columns:
             logger.warning("Missing columns for TTFT plot")
             return
 
-        plt.figure(figsize=(12, 6))
+        self._clear_axes()
 
         if "concurrency" in df.columns and df["concurrency"].nunique() > 1:
             for conc in sorted(df["concurrency"].dropna().unique()):
                 subset = df[df["concurrency"] == conc]
-                plt.plot(
+                self.ax.plot(
                     subset["input_len"],
                     subset["median_ttft_ms"],
                     marker="o",
                     label=f"Concurrency={int(conc)}",
                 )
         else:
-            plt.plot(df["input_len"], df["median_ttft_ms"], marker="o")
+            self.ax.plot(df["input_len"], df["median_ttft_ms"], marker="o")
 
-        plt.xlabel("Input Length (tokens)")
-        plt.ylabel("Median TTFT (ms)")
-        plt.title("Time To First Token vs Input Length")
-        plt.legend()
-        plt.grid(True, alpha=0.3)
+        self.ax.set_xlabel("Input Length (tokens)")
+        self.ax.set_ylabel("Median TTFT (ms)")
+        self.ax.set_title("Time To First Token vs Input Length")
+        self.ax.legend()
+        self.ax.grid(True, alpha=0.3)
 
         output = self.plots_dir / "ttft_vs_input_length.png"
-        plt.savefig(output, dpi=300, bbox_inches="tight")
-        plt.close()
+        self.fig.savefig(output, dpi=PLOT_DPI, bbox_inches="tight")
         logger.info(f"Saved: {output}")
 
     def plot_itl_vs_output_length(self, df: pd.DataFrame):
@@ -57,53 +84,52 @@ class MetricsAnalyzer:
             logger.warning("Missing columns for ITL plot")
             return
 
-        plt.figure(figsize=(12, 6))
+        self._clear_axes()
 
         if "concurrency" in df.columns and df["concurrency"].nunique() > 1:
             for conc in sorted(df["concurrency"].dropna().unique()):
                 subset = df[df["concurrency"] == conc]
-                plt.plot(
+                self.ax.plot(
                     subset["output_len"],
                     subset["median_itl_ms"],
                     marker="o",
                     label=f"Concurrency={int(conc)}",
                 )
         else:
-            plt.plot(df["output_len"], df["median_itl_ms"], marker="o")
+            self.ax.plot(df["output_len"], df["median_itl_ms"], marker="o")
 
-        plt.xlabel("Output Length (tokens)")
-        plt.ylabel("Median ITL (ms)")
-        plt.title("Inter-Token Latency vs Output Length")
-        plt.legend()
-        plt.grid(True, alpha=0.3)
+        self.ax.set_xlabel("Output Length (tokens)")
+        self.ax.set_ylabel("Median ITL (ms)")
+        self.ax.set_title("Inter-Token Latency vs Output Length")
+        self.ax.legend()
+        self.ax.grid(True, alpha=0.3)
 
         output = self.plots_dir / "itl_vs_output_length.png"
-        plt.savefig(output, dpi=300, bbox_inches="tight")
-        plt.close()
+        self.fig.savefig(output, dpi=PLOT_DPI, bbox_inches="tight")
         logger.info(f"Saved: {output}")
 
-    def plot_latency_vs_concurrency(self, df: pd.DataFrame):
+    def plot_latency_vs_concurrency(
+        self, df: pd.DataFrame, grouped: Optional[DataFrameGroupBy] = None
+    ):
         """Latency vs Concurrency"""
         if "concurrency" not in df.columns:
             logger.warning("No concurrency column")
             return
 
-        plt.figure(figsize=(12, 6))
+        self._clear_axes()
 
-        grouped = (
-            df.groupby("concurrency")
-            .agg({"median_ttft_ms": "mean", "p99_ttft_ms": "mean"})
-            .reset_index()
-        )
+        if grouped is None:
+            grouped = df.groupby("concurrency")
+        grouped = grouped[["median_ttft_ms", "p99_ttft_ms"]].mean().reset_index()
 
-        plt.plot(
+        self.ax.plot(
             grouped["concurrency"],
             grouped["median_ttft_ms"],
             marker="o",
             label="Median TTFT",
             linewidth=2,
         )
-        plt.plot(
+        self.ax.plot(
             grouped["concurrency"],
             grouped["p99_ttft_ms"],
             marker="s",
@@ -111,28 +137,31 @@ class MetricsAnalyzer:
             linewidth=2,
         )
 
-        plt.xlabel("Concurrency Level")
-        plt.ylabel("TTFT (ms)")
-        plt.title("Latency vs Concurrency")
-        plt.legend()
-        plt.grid(True, alpha=0.3)
+        self.ax.set_xlabel("Concurrency Level")
+        self.ax.set_ylabel("TTFT (ms)")
+        self.ax.set_title("Latency vs Concurrency")
+        self.ax.legend()
+        self.ax.grid(True, alpha=0.3)
 
         output = self.plots_dir / "latency_vs_concurrency.png"
-        plt.savefig(output, dpi=300, bbox_inches="tight")
-        plt.close()
+        self.fig.savefig(output, dpi=PLOT_DPI, bbox_inches="tight")
         logger.info(f"Saved: {output}")
 
-    def plot_throughput_vs_concurrency(self, df: pd.DataFrame):
+    def plot_throughput_vs_concurrency(
+        self, df: pd.DataFrame, grouped: Optional[DataFrameGroupBy] = None
+    ):
         """Throughput vs Concurrency"""
         if "concurrency" not in df.columns or "throughput" not in df.columns:
             logger.warning("Missing columns for throughput plot")
             return
 
-        plt.figure(figsize=(12, 6))
+        self._clear_axes()
 
-        grouped = df.groupby("concurrency")["throughput"].mean().reset_index()
+        if grouped is None:
+            grouped = df.groupby("concurrency")
+        grouped = grouped["throughput"].mean().reset_index()
 
-        plt.plot(
+        self.ax.plot(
             grouped["concurrency"],
             grouped["throughput"],
             marker="o",
@@ -140,23 +169,33 @@ class MetricsAnalyzer:
             markersize=8,
         )
 
-        plt.xlabel("Concurrency Level")
-        plt.ylabel("Throughput (tokens/s)")
-        plt.title("Throughput vs Concurrency")
-        plt.grid(True, alpha=0.3)
+        self.ax.set_xlabel("Concurrency Level")
+        self.ax.set_ylabel("Throughput (tokens/s)")
+        self.ax.set_title("Throughput vs Concurrency")
+        self.ax.grid(True, alpha=0.3)
 
         output = self.plots_dir / "throughput_vs_concurrency.png"
-        plt.savefig(output, dpi=300, bbox_inches="tight")
-        plt.close()
+        self.fig.savefig(output, dpi=PLOT_DPI, bbox_inches="tight")
         logger.info(f"Saved: {output}")
 
     def generate_all_plots(self, df: pd.DataFrame, plot_types: List[str]):
         """Generate all plots"""
+        # Group once, shared by the concurrency-based plots
+        grouped = (
+            df.groupby("concurrency", sort=True, observed=True)
+            if "concurrency" in df.columns
+            else None
+        )
+
         plot_methods = {
             "ttft_vs_input_length": self.plot_ttft_vs_input_length,
             "itl_vs_output_length": self.plot_itl_vs_output_length,
-            "latency_vs_concurrency": self.plot_latency_vs_concurrency,
-            "throughput_vs_concurrency": self.plot_throughput_vs_concurrency,
+            "latency_vs_concurrency": partial(
+                self.plot_latency_vs_concurrency, grouped=grouped
+            ),
+            "throughput_vs_concurrency": partial(
+                self.plot_throughput_vs_concurrency, grouped=grouped
+            ),
         }
 
         for plot_type in plot_types:
@@ -1,13 +1,37 @@
 """Result aggregator"""
 
+from __future__ import annotations
+
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict
-import pandas as pd
+from typing import TYPE_CHECKING, List, Dict
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# vllm bench summary metrics copied into the aggregated table
+METRIC_COLUMNS = (
+    "total_time",
+    "throughput",
+    "mean_ttft_ms",
+    "median_ttft_ms",
+    "p99_ttft_ms",
+    "mean_tpot_ms",
+    "median_tpot_ms",
+    "p99_tpot_ms",
+    "mean_itl_ms",
+    "median_itl_ms",
+    "p99_itl_ms",
+)
+
 
 class ResultAggregator:
     """Aggregate vllm bench results"""
@@ -18,7 +42,16 @@ class ResultAggregator:
 
     def aggregate_results(self, results: List[Dict]) -> pd.DataFrame:
         """Aggregate results"""
-        aggregated_data = []
+        # Imported here so commands that never aggregate skip the pandas import
+        import numpy as np
+        import pandas as pd
+
+        # Accumulate column-wise, then build the DataFrame with explicit dtypes
+        run_ids, models = [], []
+        concurrency, request_rate = [], []
+        input_len, output_len, num_prompts = [], [], []
+        metrics = {name: [] for name in METRIC_COLUMNS}
+        has_summary = False
 
         for item in results:
             if item["status"] != "success" or not item["result"]:
@@ -27,73 +60,102 @@ class ResultAggregator:
             config = item["config"]
             result = item["result"]
 
-            row = {
-                "run_id": Path(config.output_json).stem,
-                "model": config.model,
-                "concurrency": config.concurrency,
-                "request_rate": config.request_rate,
-                "input_len": config.input_len,
-                "output_len": config.output_len,
-                "num_prompts": config.num_prompts,
-            }
+            run_ids.append(Path(config.output_json).stem)
+            models.append(config.model)
+            concurrency.append(config.concurrency)
+            request_rate.append(
+                np.nan if config.request_rate is None else config.request_rate
+            )
+            input_len.append(config.input_len)
+            output_len.append(config.output_len)
+            num_prompts.append(config.num_prompts)
 
             # Extract vllm bench metrics
-            if "summary" in result:
-                summary = result["summary"]
-                row.update(
-                    {
-                        "total_time": summary.get("total_time"),
-                        "throughput": summary.get("throughput"),
-                        "mean_ttft_ms": summary.get("mean_ttft_ms"),
-                        "median_ttft_ms": summary.get("median_ttft_ms"),
-                        "p99_ttft_ms": summary.get("p99_ttft_ms"),
-                        "mean_tpot_ms": summary.get("mean_tpot_ms"),
-                        "median_tpot_ms": summary.get("median_tpot_ms"),
-                        "p99_tpot_ms": summary.get("p99_tpot_ms"),
-                        "mean_itl_ms": summary.get("mean_itl_ms"),
-                        "median_itl_ms": summary.get("median_itl_ms"),
-                        "p99_itl_ms": summary.get("p99_itl_ms"),
-                    }
-                )
-
-            aggregated_data.append(row)
-
-        df = pd.DataFrame(aggregated_data)
+            summary = result.get("summary")
+            has_summary |= summary is not None
+            for name, values in metrics.items():
+                value = summary.get(name) if summary else None
+                values.append(np.nan if value is None else value)
+
+        data = {
+            "run_id": run_ids,
+            "model": models,
+            "concurrency": pd.array(concurrency, dtype="Int32"),
+            "request_rate": np.asarray(request_rate, dtype=np.float64),
+            "input_len": np.asarray(input_len, dtype=np.int32),
+            "output_len": np.asarray(output_len, dtype=np.int32),
+            "num_prompts": np.asarray(num_prompts, dtype=np.int32),
+        }
+        if has_summary:
+            data.update(
+                {
+                    name: np.asarray(values, dtype=np.float64)
+                    for name, values in metrics.items()
+                }
+            )
+
+        df = pd.DataFrame(data)
+        # Repeated strings: categories make unique()/nunique() O(K) instead of O(N)
+        for column in ("model", "run_id"):
+            df[column] = df[column].astype("category")
         logger.info(f"Aggregated {len(df)} experiments")
 
         return df
 
     def save_aggregated_results(self, df: pd.DataFrame, filepath: str):
-        """Save aggregated results"""
+        """Save aggregated results (Parquet if filepath ends in .parquet, else CSV)"""
         output_path = self.output_dir / filepath
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        df.to_csv(output_path, index=False)
+        if str(filepath).endswith(".parquet"):
+            try:
+                df.to_parquet(
+                    output_path, engine="pyarrow", compression="zstd", index=False
+                )
+            except ImportError:
+                # pyarrow is optional; never lose a finished sweep over it
+                output_path = output_path.with_suffix(".csv")
+                logger.warning("pyarrow not installed, writing CSV instead")
+                df.to_csv(output_path, index=False)
+        else:
+            df.to_csv(output_path, index=False)
         logger.info(f"Saved to {output_path}")
 
+    @staticmethod
+    def _describe(series: pd.Series) -> Dict[str, float]:
+        """Mean/min/max plus P50/P90/P99 of a metric column, ignoring failed runs"""
+        import numpy as np
+
+        arr = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        arr = arr[~np.isnan(arr)]
+        if arr.size == 0:
+            return {}
+
+        p50, p90, p99 = np.quantile(arr, [0.5, 0.9, 0.99], method="linear")
+        return {
+            "mean": float(arr.mean()),
+            "min": float(arr.min()),
+            "max": float(arr.max()),
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+        }
+
     def generate_summary(self, df: pd.DataFrame) -> Dict:
         """Generate statistical summary"""
         summary = {
             "total_experiments": len(df),
-            "models": df["model"].unique().tolist(),
+            "models": df["model"].cat.categories.tolist(),
             "concurrency_levels": sorted(df["concurrency"].dropna().unique().tolist()),
             "input_lengths": sorted(df["input_len"].unique().tolist()),
             "output_lengths": sorted(df["output_len"].unique().tolist()),
         }
 
         if "throughput" in df.columns:
-            summary["overall_throughput"] = {
-                "mean": float(df["throughput"].mean()),
-                "min": float(df["throughput"].min()),
-                "max": float(df["throughput"].max()),
-            }
+            summary["overall_throughput"] = self._describe(df["throughput"])
 
         if "mean_ttft_ms" in df.columns:
-            summary["overall_ttft"] = {
-                "mean": float(df["mean_ttft_ms"].mean()),
-                "min": float(df["mean_ttft_ms"].min()),
-                "max": float(df["mean_ttft_ms"].max()),
-            }
+            summary["overall_ttft"] = self._describe(df["mean_ttft_ms"])
 
         return summary
 
@@ -102,7 +164,14 @@ class ResultAggregator:
         output_path = self.output_dir / filepath
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            output_path.write_bytes(
+                orjson.dumps(
+                    summary, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+                )
+            )
+        else:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
 
         logger.info(f"Saved summary to {output_path}")